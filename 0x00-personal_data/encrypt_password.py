@@ -3,8 +3,52 @@
 Module for securely hashing and validating passwords.
 """
 
+from functools import lru_cache
+import json
+import os
 import bcrypt
 
+DEFAULT_ROUNDS = 12
+
+
+@lru_cache(maxsize=8)
+def _config_rounds(config_path: str) -> int:
+    """
+    Returns the cost factor stored in a bcrypt configuration file, read
+    once per path, or the default.
+    """
+    try:
+        with open(config_path, 'r') as f:
+            return int(json.load(f)["rounds"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return DEFAULT_ROUNDS
+
+
+def get_rounds() -> int:
+    """
+    Returns the bcrypt cost factor set by BCRYPT_ROUNDS, else the one
+    stored in the BCRYPT_CONFIG file (default .bcrypt.json) by the
+    calibration of 0x03-user_authentication_service/hashing.py, else
+    the default.
+    """
+    try:
+        return int(os.environ["BCRYPT_ROUNDS"])
+    except (KeyError, ValueError):
+        return _config_rounds(os.getenv("BCRYPT_CONFIG", ".bcrypt.json"))
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """
+    Tells whether a hash was made with another cost than get_rounds().
+
+    Returns:
+        bool: True if the password should be hashed again.
+    """
+    try:
+        return int(hashed_password.split(b"$")[2]) != get_rounds()
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return True
+
 
 def hash_password(password: str) -> bytes:
     """
@@ -16,7 +60,7 @@ def hash_password(password: str) -> bytes:
     Returns:
         bytes: A salted, hashed password.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(get_rounds())
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed
 
@@ -4,15 +4,34 @@ Module for filtering and obfuscating sensitive data in log messages.
 """
 
 import logging
-from typing import List
+import logging.handlers
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator, List, Pattern, Sequence, Tuple
+import queue
 import re
 import os
+import threading
+import time
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
 
 
+@lru_cache(maxsize=128)
+def _redaction_pattern(fields: Tuple[str, ...], separator: str) -> Pattern:
+    """
+    Compiles the pattern matching `field=value<separator>` for fields.
+    Returns:
+        The compiled pattern, cached per (fields, separator).
+    """
+    return re.compile(
+        f"({'|'.join(map(re.escape, fields))})=.*?{re.escape(separator)}")
+
+
 def filter_datum(fields: List[str], redaction: str,
                  message: str, separator: str) -> str:
     """
@@ -20,9 +39,72 @@ def filter_datum(fields: List[str], redaction: str,
     Returns:
         The obfuscated log message.
     """
-    pattern = f"({'|'.join(map(re.escape, fields))})=.*?{re.escape(separator)}"
-    return re.sub(pattern, lambda m:
-                  f"{m.group(1)}={redaction}{separator}", message)
+    return Redactor(fields, redaction, separator).redact(message)
+
+
+class Redactor:
+    """ Obfuscates fields of messages with a pattern compiled once """
+
+    def __init__(self, fields: List[str], redaction: str, separator: str):
+        """
+        Initialize the redactor for the given fields and separator.
+        """
+        self.pattern = _redaction_pattern(tuple(fields), separator)
+        self.replacement = "\\g<1>=" + \
+            f"{redaction}{separator}".replace("\\", "\\\\")
+
+    def redact(self, message: str) -> str:
+        """
+        Obfuscates the fields in a message.
+        Returns:
+            The obfuscated message.
+        """
+        return self.pattern.sub(self.replacement, message)
+
+
+class TokenRedactor:
+    """
+    Obfuscates fields of `key=value<separator>` records without regex.
+
+    The message is split once on the separator and each complete token
+    whose key (ignoring leading whitespace) is a field gets its value
+    replaced. filter_datum's pattern is not anchored to keys, so messages
+    where another token still contains `<field>=` (e.g. `username=bob;`
+    or a user agent holding `name=`), messages spanning several lines and
+    fields or separators the split cannot handle are handed to the regex
+    Redactor. The output is therefore always identical to filter_datum.
+    """
+
+    def __init__(self, fields: List[str], redaction: str, separator: str):
+        """
+        Initialize the redactor for the given fields and separator.
+        """
+        self.fields = frozenset(fields)
+        self.needles = tuple(f"{field}=" for field in fields)
+        self.redaction = redaction
+        self.separator = separator
+        self.fallback = Redactor(fields, redaction, separator)
+        self.splittable = bool(separator) and "=" not in separator and \
+            "\n" not in separator and all(
+                field and not field[0].isspace() and "=" not in field and
+                not set(separator) & set(field) for field in fields)
+
+    def redact(self, message: str) -> str:
+        """
+        Obfuscates the fields in a message.
+        Returns:
+            The obfuscated message.
+        """
+        if not self.splittable or "\n" in message:
+            return self.fallback.redact(message)
+        tokens = message.split(self.separator)
+        for i in range(len(tokens) - 1):
+            key, eq, _ = tokens[i].partition("=")
+            if eq and key.lstrip() in self.fields:
+                tokens[i] = f"{key}={self.redaction}"
+            elif eq and any(needle in tokens[i] for needle in self.needles):
+                return self.fallback.redact(message)
+        return self.separator.join(tokens)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -32,15 +114,22 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], mode: str = "regex"):
         """
         Initialize the formatter with fields to redact.
 
         Args:
             fields: List of fields to redact.
+            mode: "regex" to redact with filter_datum's pattern, or
+                "tokenize" to split structured records on the separator.
         """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        if mode == "tokenize":
+            redactor_class = TokenRedactor
+        else:
+            redactor_class = Redactor
+        self.redactor = redactor_class(fields, self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -48,15 +137,90 @@ class RedactingFormatter(logging.Formatter):
         Returns:
             The formatted and redacted log record.
         """
-        record.msg = filter_datum(
-            self.fields, self.REDACTION, record.getMessage(), self.SEPARATOR)
+        record.msg = self.redactor.redact(record.getMessage())
         return super(RedactingFormatter, self).format(record)
 
 
-def get_logger() -> logging.Logger:
+class _BlockingQueueListener(logging.handlers.QueueListener):
+    """ Queue listener waiting for room to post its stop sentinel """
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Posts the stop sentinel, waiting if the queue is full.
+        """
+        self.queue.put(self._sentinel)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler handing records to a listener thread.
+
+    Formatting, redaction and I/O run on the listener thread. When the
+    bounded queue is full, the caller waits if `block` is set, otherwise
+    the record is dropped and counted in `dropped`. Closing the handler,
+    which logging does at exit, drains the queue.
+    """
+
+    def __init__(self, target: logging.Handler, queue_size: int,
+                 block: bool = True):
+        """
+        Initialize the handler and start its listener thread.
+        """
+        super(BoundedQueueHandler, self).__init__(queue.Queue(queue_size))
+        self.block = block
+        self.dropped = 0
+        self.listener = _BlockingQueueListener(self.queue, target)
+        self.listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merges the message arguments, leaving formatting to the listener.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Queues a record following the block/drop policy.
+        """
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """
+        Stops the listener once the queued records are handled.
+        """
+        if self.listener._thread is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.flush()
+        super(BoundedQueueHandler, self).close()
+
+
+def get_logger(buffer_size: int = 0, redact: bool = True,
+               queue_size: int = 0, block: bool = True) -> logging.Logger:
     """
     Creates a logger instance for user data with sensitive fields redacted.
 
+    Calling it again with the same arguments returns the logger as is;
+    with other arguments its handler is replaced, never duplicated.
+
+    Args:
+        buffer_size: When positive, records are buffered and written to
+            the stream by batches of that many records.
+        redact: False for records already redacted upstream, which are
+            then only formatted.
+        queue_size: When positive, records go through a queue of that size
+            to a listener thread doing the redaction and the writes.
+        block: With a queue, wait for room when it is full instead of
+            dropping the record.
+
     Returns:
         A logging.Logger object configured with a RedactingFormatter.
     """
@@ -64,10 +228,26 @@ def get_logger() -> logging.Logger:
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
-    stream_handler = logging.StreamHandler()
-    formatter = RedactingFormatter(fields=PII_FIELDS)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    config = (buffer_size, redact, queue_size, block)
+    if len(logger.handlers) == 1 and \
+            getattr(logger.handlers[0], "user_data_config", None) == config:
+        return logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    handler = logging.StreamHandler()
+    if redact:
+        formatter = RedactingFormatter(fields=PII_FIELDS)
+    else:
+        formatter = logging.Formatter(RedactingFormatter.FORMAT)
+    handler.setFormatter(formatter)
+    if buffer_size > 0:
+        handler = logging.handlers.MemoryHandler(buffer_size, target=handler)
+    if queue_size > 0:
+        handler = BoundedQueueHandler(handler, queue_size, block)
+    handler.user_data_config = config
+    logger.addHandler(handler)
 
     return logger
 
@@ -90,27 +270,216 @@ def get_db() -> MySQLConnection:
     return conn
 
 
+class ConnectionPool:
+    """
+    Pool of database connections.
+
+    At most `size` connections are checked out at once. Idle connections
+    are reused most recent first; one idle for more than `idle_timeout`
+    seconds or failing its health check is closed and replaced.
+    """
+
+    def __init__(self, connect: Callable = None, size: int = 5,
+                 idle_timeout: float = 300.0, timeout: float = None):
+        """
+        Initialize the pool.
+
+        Args:
+            connect: Factory opening a connection, get_db by default.
+            size: Maximum number of connections checked out at once.
+            idle_timeout: Seconds after which an idle connection is closed.
+            timeout: Seconds to wait for a free slot, None to wait forever.
+        """
+        self.connect = connect or get_db
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        """
+        Checks that a connection still answers.
+        """
+        try:
+            if hasattr(conn, "is_connected"):
+                return conn.is_connected()
+            conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn) -> None:
+        """
+        Closes a connection, ignoring errors from a dead one.
+        """
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """
+        Checks a healthy connection out of the pool.
+
+        Raises:
+            TimeoutError: If no slot frees up within the timeout.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No database connection available")
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if time.monotonic() - last_used <= self.idle_timeout and \
+                        self.is_healthy(conn):
+                    return conn
+                self._close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn) -> None:
+        """
+        Returns a connection to the pool.
+        """
+        self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager checking a connection out and back in.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """
+        Closes every idle connection.
+        """
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    Creates a pool of connections opened by get_db.
+
+    The pool size and idle timeout come from PERSONAL_DATA_DB_POOL_SIZE
+    (default 5) and PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT (default 300s).
+
+    Returns:
+        A ConnectionPool over the PERSONAL_DATA_DB_* database.
+    """
+    try:
+        size = int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE') or 5)
+        idle_timeout = float(
+            os.getenv('PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT') or 300)
+    except ValueError:
+        size, idle_timeout = 5, 300.0
+    return ConnectionPool(get_db, size, idle_timeout)
+
+
+def to_records(columns: Sequence[str], rows: Sequence[tuple]) -> List[str]:
+    """
+    Formats rows as `key=value; ` records.
+    """
+    return ["; ".join(f"{key}={value}" for key, value in zip(columns, row))
+            for row in rows]
+
+
+def stream_records(cursor, batch_size: int) -> Iterator[str]:
+    """
+    Yields the rows of an executed query as `key=value; ` records.
+
+    Rows are fetched batch_size at a time, so with an unbuffered cursor
+    at most one batch is held in memory.
+    """
+    columns = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from to_records(columns, rows)
+
+
+def redact_rows(columns: Sequence[str], rows: Sequence[tuple]) -> List[str]:
+    """
+    Formats and redacts a batch of rows, in a pipeline worker process.
+
+    Returns:
+        The redacted records, in row order.
+    """
+    redactor = Redactor(PII_FIELDS, RedactingFormatter.REDACTION,
+                        RedactingFormatter.SEPARATOR)
+    return [redactor.redact(record) for record in to_records(columns, rows)]
+
+
+def export_parallel(cursor, logger: logging.Logger, batch_size: int,
+                    workers: int) -> None:
+    """
+    Logs the rows of an executed query, redacted by a pool of processes.
+
+    Batches are redacted concurrently but logged in row order; at most two
+    batches per worker are in flight so memory stays bounded. The logger
+    must not redact again: records reach it already obfuscated.
+    """
+    columns = [column[0] for column in cursor.description]
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if rows:
+                pending.append(pool.submit(redact_rows, columns, rows))
+            if pending and (not rows or len(pending) >= workers * 2):
+                for record in pending.popleft().result():
+                    logger.info(record)
+            elif not rows:
+                break
+
+
 def main() -> None:
     """
     Main function to log user data with sensitive fields filtered.
 
-    Retrieves rows from the users table and logs sensitive fields redacted.
+    Retrieves rows from the users table and logs sensitive fields redacted,
+    streaming PERSONAL_DATA_BATCH_SIZE rows at a time (default 1000).
+    With PERSONAL_DATA_WORKERS above 1, redaction runs in that many
+    processes.
     """
-    logger = get_logger()
+    try:
+        batch_size = int(os.getenv('PERSONAL_DATA_BATCH_SIZE') or 1000)
+        workers = int(os.getenv('PERSONAL_DATA_WORKERS') or 1)
+    except ValueError:
+        batch_size, workers = 1000, 1
+    logger = get_logger(buffer_size=batch_size, redact=workers <= 1)
     db = get_db()
+    # mysql.connector cursors are unbuffered unless asked otherwise
     cursor = db.cursor()
 
     try:
         cursor.execute("SELECT * FROM users;")
-        columns = [column[0] for column in cursor.description]
-        for row in cursor:
-            record = "; ".join(
-                f"{key}={value}" for key, value in zip(columns, row)
-            )
-            logger.info(record)
+        if workers > 1:
+            export_parallel(cursor, logger, batch_size, workers)
+        else:
+            for record in stream_records(cursor, batch_size):
+                logger.info(record)
     finally:
         cursor.close()
         db.close()
+        for handler in logger.handlers:
+            handler.flush()
 
 
 if __name__ == "__main__":
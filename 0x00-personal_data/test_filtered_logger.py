@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests of the redactors of filtered_logger.
+"""
+
+import random
+import unittest
+from filtered_logger import PII_FIELDS, TokenRedactor, filter_datum
+
+
+class TestTokenRedactor(unittest.TestCase):
+    """ TokenRedactor must match filter_datum on any message """
+
+    ALPHABET = ["name", "email", "phone", "ssn", "password", "user", "ip",
+                "=", ";", ";;", " ", "\n", "a", "1", "***"]
+
+    def check(self, fields, separator, message):
+        """ Compare TokenRedactor with filter_datum on one message """
+        expected = filter_datum(list(fields), "***", message, separator)
+        redactor = TokenRedactor(list(fields), "***", separator)
+        self.assertEqual(redactor.redact(message), expected,
+                         (fields, separator, message))
+
+    def test_examples(self):
+        """ Values and keys containing a field name """
+        for message in ["ip=1;user_agent=name=foo;last=1",
+                        "username=bob;",
+                        "name=bob;email=bob@x.io;ip=1;",
+                        " name=bob; password=x;last=1",
+                        "name=a=b;ssn=1",
+                        "name=bob\nemail=x;"]:
+            self.check(PII_FIELDS, ";", message)
+
+    def test_random_messages(self):
+        """ Random messages built from fields, separators and noise """
+        rng = random.Random(0)
+        field_sets = [PII_FIELDS, ("name",), ("na", "name"), ("a;b",),
+                      ("=x",), (" name",)]
+        for _ in range(5000):
+            fields = rng.choice(field_sets)
+            separator = rng.choice([";", ";;", ",", "="])
+            message = "".join(rng.choice(self.ALPHABET)
+                              for _ in range(rng.randint(0, 20)))
+            self.check(fields, separator, message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,16 +5,26 @@ from datetime import datetime
 from typing import TypeVar, List, Iterable
 from os import path
 import json
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
 
 
 class Base():
     """ Base class
+
+    Subclasses can declare secondary indexes in `_indexes`, a dict of
+    attribute name -> unique flag, e.g. `_indexes = {'email': True}`.
+    Indexes reflect attribute values as of the last `save()`; the unique
+    check and the insert of an object run under one lock per class.
     """
+    _indexes = {}
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -57,20 +67,82 @@ class Base():
                 result[key] = value
         return result
 
+    @classmethod
+    def _lock(cls) -> threading.RLock:
+        """ Return the lock guarding the objects and indexes of the class
+        """
+        with _LOCKS_LOCK:
+            return LOCKS.setdefault(cls.__name__, threading.RLock())
+
+    @classmethod
+    def _index_for(cls) -> dict:
+        """ Return the index tables of the class, creating them if needed
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            INDEXES[s_class] = {
+                'keys': {},
+                'values': {attr: {} for attr in cls._indexes},
+            }
+        return INDEXES[s_class]
+
+    @classmethod
+    def _index_remove(cls, obj_id: str):
+        """ Drop an object from every index of the class
+        """
+        index = cls._index_for()
+        keys = index['keys'].pop(obj_id, None)
+        if keys is None:
+            return
+        for attr, value in keys.items():
+            ids = index['values'][attr].get(value)
+            if ids is None:
+                continue
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del index['values'][attr][value]
+
+    @classmethod
+    def _index_add(cls, obj: TypeVar('Base'), check: bool = False):
+        """ Register an object in every index of the class
+        Unhashable values are left out, searches on them fall back to a scan
+        """
+        index = cls._index_for()
+        keys = {}
+        for attr, unique in cls._indexes.items():
+            value = getattr(obj, attr, None)
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            ids = index['values'][attr].get(value)
+            if check and unique and value is not None and ids and \
+                    any(obj_id != obj.id for obj_id in ids):
+                raise ValueError("{} {} already exists".format(attr, value))
+            keys[attr] = value
+        cls._index_remove(obj.id)
+        for attr, value in keys.items():
+            index['values'][attr].setdefault(value, {})[obj.id] = True
+        index['keys'][obj.id] = keys
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        with cls._lock():
+            DATA[s_class] = {}
+            INDEXES.pop(s_class, None)
+            if not path.exists(file_path):
+                return
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+                for obj_id, obj_json in objs_json.items():
+                    obj = cls(**obj_json)
+                    DATA[s_class][obj_id] = obj
+                    cls._index_add(obj)
 
     @classmethod
     def save_to_file(cls):
@@ -79,8 +151,9 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with cls._lock():
+            for obj_id, obj in DATA[s_class].items():
+                objs_json[obj_id] = obj.to_json(True)
 
         with open(file_path, 'w') as f:
             json.dump(objs_json, f)
@@ -89,17 +162,22 @@ class Base():
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
+        with self._lock():
+            self._index_add(self, check=True)
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
         self.__class__.save_to_file()
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with self._lock():
+            if DATA[s_class].get(self.id) is None:
+                return
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self._index_remove(self.id)
+        self.__class__.save_to_file()
 
     @classmethod
     def count(cls) -> int:
@@ -126,6 +204,7 @@ class Base():
         """ Search all objects with matching attributes
         """
         s_class = cls.__name__
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +212,23 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        with cls._lock():
+            objs = DATA[s_class]
+            candidates = None
+            for k, v in attributes.items():
+                if k not in cls._indexes:
+                    continue
+                try:
+                    ids = cls._index_for()['values'][k].get(v, {})
+                except TypeError:
+                    continue
+                if candidates is None or len(ids) < len(candidates):
+                    candidates = ids
+            if candidates is None:
+                candidates = list(objs.values())
+            else:
+                candidates = [objs[obj_id] for obj_id in candidates
+                              if obj_id in objs]
+
+        return list(filter(_search, candidates))
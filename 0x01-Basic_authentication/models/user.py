@@ -8,6 +8,7 @@ from models.base import Base
 class User(Base):
     """ User class
     """
+    _indexes = {'email': True}
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
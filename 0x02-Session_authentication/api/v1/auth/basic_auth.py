@@ -5,6 +5,7 @@ BasicAuth module.
 
 import base64
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import get_credential_cache
 from models.user import User
 from typing import TypeVar
 
@@ -13,6 +14,7 @@ class BasicAuth(Auth):
     """
     BasicAuth class that inherits from Auth.
     """
+    credential_cache = get_credential_cache()
 
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
@@ -115,6 +117,18 @@ class BasicAuth(Auth):
         if authorization_header is None:
             return None
 
+        key = None
+        if self.credential_cache.max_size > 0 and \
+                isinstance(authorization_header, str):
+            key = self.credential_cache.key(authorization_header)
+            cached = self.credential_cache.get(key)
+            if cached is not None:
+                user_id, password = cached
+                user = User.get(user_id)
+                if user is not None and user.password == password:
+                    return user
+                self.credential_cache.invalidate(key)
+
         base64_header = self.extract_base64_authorization_header(
             authorization_header)
         if base64_header is None:
@@ -130,4 +144,16 @@ class BasicAuth(Auth):
         if user_email is None or user_pwd is None:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None and key is not None:
+            self.credential_cache.set(key, user.id, user.password)
+        return user
+
+    def credential_cache_stats(self) -> dict:
+        """
+        Hit rate and eviction counters of the verified-credential cache.
+        """
+        stats = self.credential_cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Credential Cache Module
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import os
+import time
+
+
+class CredentialCache:
+    """
+    Bounded LRU cache of verified Authorization headers.
+
+    Headers are keyed by an HMAC under a per-process secret, so raw
+    credentials are never kept in memory. Each entry remembers the user ID
+    and the password hash it was verified against: a hit is only valid
+    while that user still exists with the same password hash.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: int = 300):
+        """
+        Initialize a CredentialCache with a size bound and a TTL in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, authorization_header: str) -> bytes:
+        """
+        Keyed hash of an Authorization header.
+        """
+        return hmac.new(self._secret, authorization_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, key: bytes) -> Optional[Tuple[str, str]]:
+        """
+        Return the (user ID, password hash) cached for a key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key: bytes, user_id: str, password: str) -> None:
+        """
+        Cache a verified user ID and password hash for a key.
+        """
+        with self._lock:
+            self._entries[key] = (user_id, password, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: bytes) -> None:
+        """
+        Drop the entry of a key.
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Size, hit, miss and eviction counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def get_credential_cache() -> CredentialCache:
+    """
+    Build a CredentialCache sized by BASIC_AUTH_CACHE_SIZE (default 1024,
+    0 disables it) with a TTL of BASIC_AUTH_CACHE_TTL seconds (default 300).
+    """
+    try:
+        max_size = int(os.getenv("BASIC_AUTH_CACHE_SIZE", 1024))
+        ttl = int(os.getenv("BASIC_AUTH_CACHE_TTL", 300))
+    except ValueError:
+        max_size, ttl = 1024, 300
+    return CredentialCache(max_size, ttl)
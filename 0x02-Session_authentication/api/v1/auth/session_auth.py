@@ -3,6 +3,7 @@
 Session Authentication Module
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionRecord, SessionStore
 from models.user import User
 import uuid
 
@@ -11,7 +12,7 @@ class SessionAuth(Auth):
     """
     Session Authentication class that inherits from Auth.
     """
-    user_id_by_session_id = {}
+    user_id_by_session_id = SessionStore()
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -24,7 +25,7 @@ class SessionAuth(Auth):
 
         session_id = str(uuid.uuid4())
 
-        self.user_id_by_session_id[session_id] = user_id
+        self.user_id_by_session_id.set(session_id, SessionRecord(user_id))
 
         return session_id
 
@@ -37,7 +38,11 @@ class SessionAuth(Auth):
         if session_id is None or not isinstance(session_id, str):
             return None
 
-        return self.user_id_by_session_id.get(session_id)
+        record = self.user_id_by_session_id.get(session_id)
+        if record is None:
+            return None
+
+        return record.user_id
 
     def current_user(self, request=None):
         """
@@ -74,5 +79,4 @@ class SessionAuth(Auth):
         if user_id is None:
             return False
 
-        del self.user_id_by_session_id[session_id]
-        return True
+        return self.user_id_by_session_id.pop(session_id) is not None
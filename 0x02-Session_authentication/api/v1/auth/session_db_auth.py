@@ -2,9 +2,10 @@
 """
 SessionDBAuth Module
 """
-from datetime import datetime, timedelta
 from api.v1.auth.session_exp_auth import SessionExpAuth
+from api.v1.auth.session_store import SessionRecord
 from models.user_session import UserSession
+import calendar
 
 
 class SessionDBAuth(SessionExpAuth):
@@ -12,6 +13,46 @@ class SessionDBAuth(SessionExpAuth):
     SessionDBAuth class for session authentication stored in a database.
     """
 
+    def __init__(self):
+        """
+        Load stored sessions in the session store and schedule their
+        eviction.
+        """
+        super().__init__()
+        UserSession.load_from_file()
+        if self.session_duration <= 0:
+            return
+
+        for session in UserSession.all():
+            created_at = self._created_at(session)
+            self.user_id_by_session_id.set(
+                session.session_id,
+                SessionRecord(session.user_id, created_at))
+            self.user_id_by_session_id.schedule(
+                session.session_id, created_at + self.session_duration)
+
+    @staticmethod
+    def _created_at(session: UserSession) -> int:
+        """
+        Epoch creation time of a UserSession, created_at being in UTC.
+        """
+        return calendar.timegm(session.created_at.timetuple())
+
+    def evict_expired(self) -> list:
+        """
+        Remove expired sessions from memory and from the database,
+        writing the database once per sweep.
+        """
+        expired = super().evict_expired()
+        removed = 0
+        for session_id in expired:
+            for session in UserSession.search({"session_id": session_id}):
+                session.remove(persist=False)
+                removed += 1
+        if removed > 0:
+            UserSession.save_to_file()
+        return expired
+
     def create_session(self, user_id=None):
         """
         Create a session and store it in the database.
@@ -32,6 +73,8 @@ class SessionDBAuth(SessionExpAuth):
         if session_id is None:
             return None
 
+        self.evict_expired()
+
         # Search for the session in the database
         sessions = UserSession.search({"session_id": session_id})
         if not sessions or len(sessions) == 0:
@@ -42,12 +85,12 @@ class SessionDBAuth(SessionExpAuth):
             return session.user_id
 
         # Validate session expiration
-        created_at = session.created_at
-        if not created_at:
+        if not session.created_at:
             return None
 
-        expiration_time = created_at + timedelta(seconds=self.session_duration)
-        if expiration_time < datetime.now():
+        if self.is_expired(self._created_at(session)):
+            self.user_id_by_session_id.expire(session_id)
+            session.remove()
             return None
 
         return session.user_id
@@ -70,4 +113,5 @@ class SessionDBAuth(SessionExpAuth):
 
         session = sessions[0]
         session.remove()
+        self.user_id_by_session_id.pop(session_id)
         return True
@@ -2,9 +2,9 @@
 """
 Session Expiration Authentication Module
 """
-from datetime import datetime, timedelta
 from os import getenv
 from api.v1.auth.session_auth import SessionAuth
+import time
 
 
 class SessionExpAuth(SessionAuth):
@@ -21,18 +21,42 @@ class SessionExpAuth(SessionAuth):
         except ValueError:
             self.session_duration = 0
 
+    def is_expired(self, created_at: int) -> bool:
+        """
+        Check whether a session created at an epoch time has expired.
+        """
+        if self.session_duration <= 0:
+            return False
+
+        return created_at + self.session_duration < time.time()
+
+    def evict_expired(self) -> list:
+        """
+        Remove the sessions that have reached their expiration time.
+        Returns:
+            list: The expired session IDs.
+        """
+        return self.user_id_by_session_id.evict()
+
+    def session_stats(self) -> dict:
+        """
+        Counters of live, expired and evicted sessions.
+        """
+        return self.user_id_by_session_id.stats()
+
     def create_session(self, user_id=None):
         """
-        Create a Session ID with an expiration time.
+        Create a Session ID scheduled for eviction at its expiration time.
         """
+        self.evict_expired()
         session_id = super().create_session(user_id)
         if not session_id:
             return None
 
-        self.user_id_by_session_id[session_id] = {
-            "user_id": user_id,
-            "created_at": datetime.now()
-        }
+        if self.session_duration > 0:
+            record = self.user_id_by_session_id.get(session_id)
+            self.user_id_by_session_id.schedule(
+                session_id, record.created_at + self.session_duration)
         return session_id
 
     def user_id_for_session_id(self, session_id=None):
@@ -42,22 +66,13 @@ class SessionExpAuth(SessionAuth):
         if session_id is None:
             return None
 
-        session_data = self.user_id_by_session_id.get(session_id)
-        if not session_data:
-            return None
-
-        if "created_at" not in session_data:
-            return None
-
-        if self.session_duration <= 0:
-            return session_data.get("user_id")
-
-        created_at = session_data.get("created_at")
-        if not created_at or not isinstance(created_at, datetime):
+        self.evict_expired()
+        record = self.user_id_by_session_id.get(session_id)
+        if record is None:
             return None
 
-        expiration_time = created_at + timedelta(seconds=self.session_duration)
-        if expiration_time < datetime.now():
+        if self.is_expired(record.created_at):
+            self.user_id_by_session_id.expire(session_id)
             return None
 
-        return session_data.get("user_id")
+        return record.user_id
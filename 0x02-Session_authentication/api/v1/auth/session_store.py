@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Session Store Module
+"""
+from threading import Lock
+from typing import List, Optional
+import heapq
+import time
+
+
+class SessionRecord:
+    """
+    Compact in-memory session entry.
+    """
+    __slots__ = ("user_id", "created_at")
+
+    def __init__(self, user_id: str, created_at: int = None):
+        """
+        Initialize a SessionRecord, created_at being epoch seconds.
+        """
+        self.user_id = user_id
+        if created_at is None:
+            created_at = int(time.time())
+        self.created_at = created_at
+
+
+class SessionStore:
+    """
+    Thread-safe session ID -> SessionRecord map, split in shards that
+    each have their own lock so concurrent requests rarely contend.
+
+    Sessions given an expiry time are kept in a min-heap so `evict`
+    removes them in expiry order without scanning the whole store.
+    """
+
+    def __init__(self, shards: int = 16):
+        """
+        Initialize a SessionStore with a number of shards.
+        """
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [Lock() for _ in range(shards)]
+        self._expiries = []
+        self._expiries_lock = Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _shard(self, session_id: str) -> int:
+        """
+        Index of the shard holding a session ID.
+        """
+        return hash(session_id) % len(self._shards)
+
+    def set(self, session_id: str, record: SessionRecord) -> None:
+        """
+        Store a record under a session ID.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            self._shards[i][session_id] = record
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """
+        Return the record of a session ID, or None.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            return self._shards[i].get(session_id)
+
+    def pop(self, session_id: str) -> Optional[SessionRecord]:
+        """
+        Remove and return the record of a session ID, or None.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            return self._shards[i].pop(session_id, None)
+
+    def schedule(self, session_id: str, expires_at: int) -> None:
+        """
+        Register the epoch time after which a session is evicted.
+        """
+        with self._expiries_lock:
+            heapq.heappush(self._expiries, (expires_at, session_id))
+
+    def expire(self, session_id: str) -> None:
+        """
+        Remove a session found expired on lookup.
+        """
+        self.pop(session_id)
+        with self._expiries_lock:
+            self.expired += 1
+
+    def evict(self, now: float = None) -> List[str]:
+        """
+        Remove every session whose expiry time has passed.
+        Returns:
+            list: The session IDs that reached their expiry time.
+        """
+        if now is None:
+            now = time.time()
+        due = []
+        with self._expiries_lock:
+            while self._expiries and self._expiries[0][0] < now:
+                due.append(heapq.heappop(self._expiries)[1])
+        evicted = [session_id for session_id in due
+                   if self.pop(session_id) is not None]
+        with self._expiries_lock:
+            self.evicted += len(evicted)
+        return due
+
+    def stats(self) -> dict:
+        """
+        Counters of live, expired on lookup and evicted sessions.
+        """
+        return {
+            "live": len(self),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def __len__(self) -> int:
+        """
+        Number of stored sessions.
+        """
+        return sum(len(shard) for shard in self._shards)
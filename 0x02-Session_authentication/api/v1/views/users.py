@@ -2,18 +2,96 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+from urllib.parse import urlencode
+import heapq
+import json
+
+BULK_BATCH_SIZE = 1000
+BULK_MAX_ERRORS = 100
+USER_FIELDS = ('id', 'email', 'first_name', 'last_name',
+               'created_at', 'updated_at')
+USER_FILTERS = ('email', 'first_name', 'last_name')
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (all optional):
+      - limit: maximum number of users returned
+      - after: ID of the last user of the previous page
+      - fields: comma separated attributes to return, e.g. email,first_name
+      - email, first_name, last_name: equality filters
+    Users are sorted by ID, so without parameters all users are returned
+    ordered by ID rather than by creation. A page without filters is
+    read from the sorted IDs of User.page(); with filters, the indexed
+    matches are sorted. When more users follow, a `Link` header with
+    rel="next" gives the URL of the next page.
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, streamed
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    args = request.args.to_dict()
+    limit = args.pop('limit', None)
+    after = args.pop('after', None)
+    fields = args.pop('fields', None)
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+    if fields is not None:
+        fields = fields.split(',')
+        for field in fields:
+            if field not in USER_FIELDS:
+                return jsonify(
+                    {'error': "Unknown field {}".format(field)}), 400
+    for key in args:
+        if key not in USER_FILTERS:
+            return jsonify({'error': "Unknown filter {}".format(key)}), 400
+
+    if not args:
+        page = User.page(None if limit is None else limit + 1, after)
+    else:
+        users = User.search(args)
+        if after is not None:
+            users = (user for user in users if user.id > after)
+        if limit is None:
+            page = sorted(users, key=lambda user: user.id)
+        else:
+            page = heapq.nsmallest(limit + 1, users,
+                                   key=lambda user: user.id)
+
+    headers = {}
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_args = request.args.to_dict()
+        next_args['after'] = page[-1].id
+        headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(next_args))
+
+    def generate():
+        yield '['
+        separator = ''
+        batch = []
+        for user in page:
+            user_json = user.to_json()
+            if fields is not None:
+                user_json = {field: user_json.get(field) for field in fields}
+            batch.append(json.dumps(user_json))
+            if len(batch) >= BULK_BATCH_SIZE:
+                yield separator + ','.join(batch)
+                separator = ','
+                batch = []
+        if batch:
+            yield separator + ','.join(batch)
+        yield ']\n'
+
+    return Response(generate(), mimetype='application/json',
+                    headers=headers)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -94,6 +172,78 @@ def create_user() -> str:
     return jsonify({'error': error_msg}), 400
 
 
+@app_views.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def create_users_bulk() -> str:
+    """ POST /api/v1/users/bulk
+    NDJSON body, one JSON object per line:
+      - email
+      - password
+      - last_name (optional)
+      - first_name (optional)
+    The body is read line by line and all users are written to file once
+    at the end.
+    Return:
+      - number of created users and the first errors by line number
+    """
+    created = 0
+    errors = []
+    error_count = 0
+    for line_number, line in enumerate(request.stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        error_msg = None
+        try:
+            rj = json.loads(line)
+        except ValueError:
+            rj = None
+        if not isinstance(rj, dict):
+            error_msg = "Wrong format"
+        if error_msg is None and rj.get("email", "") == "":
+            error_msg = "email missing"
+        if error_msg is None and rj.get("password", "") == "":
+            error_msg = "password missing"
+        if error_msg is None:
+            try:
+                user = User()
+                user.email = rj.get("email")
+                user.password = rj.get("password")
+                user.first_name = rj.get("first_name")
+                user.last_name = rj.get("last_name")
+                user.save(persist=False)
+                created += 1
+            except Exception as e:
+                error_msg = "Can't create User: {}".format(e)
+        if error_msg is not None:
+            error_count += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                errors.append({'line': line_number, 'error': error_msg})
+    if created > 0:
+        User.save_to_file()
+    return jsonify({'created': created, 'error_count': error_count,
+                    'errors': errors}), 201 if created > 0 else 400
+
+
+@app_views.route('/users/export', methods=['GET'], strict_slashes=False)
+def export_users() -> str:
+    """ GET /api/v1/users/export
+    Return:
+      - NDJSON stream of all User objects JSON represented, written
+        BULK_BATCH_SIZE users at a time
+    """
+    def generate():
+        batch = []
+        for user in User.all():
+            batch.append(json.dumps(user.to_json()))
+            if len(batch) >= BULK_BATCH_SIZE:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
 def update_user(user_id: str = None) -> str:
     """ PUT /api/v1/users/:id
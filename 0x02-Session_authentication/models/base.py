@@ -2,19 +2,36 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Optional
+from models.storage import get_storage
+import bisect
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+SCHEMAS = {}
+STORAGE = get_storage()
 
 
 class Base():
     """ Base class
+
+    Subclasses can declare secondary indexes in `_indexes`, a dict of
+    attribute name -> unique flag, e.g. `_indexes = {'email': True}`.
+    Indexes reflect attribute values as of the last `save()`; the unique
+    check and the insert of an object run under one lock per class. IDs
+    are also kept sorted, for `page()`.
+
+    Attributes are declared in `__slots__`; subclasses list their own
+    ones, e.g. `__slots__ = ('email', '_password')`.
     """
+    __slots__ = ('id', 'created_at', 'updated_at')
+    _indexes = {}
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -25,13 +42,11 @@ class Base():
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = datetime.fromisoformat(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = datetime.fromisoformat(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -44,62 +59,176 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def _schema(cls) -> tuple:
+        """ Return the (attribute name, private flag) pairs of the class,
+        base class attributes first
+        """
+        schema = SCHEMAS.get(cls)
+        if schema is None:
+            names = []
+            for klass in reversed(cls.__mro__):
+                slots = klass.__dict__.get('__slots__', ())
+                if isinstance(slots, str):
+                    slots = (slots,)
+                for name in slots:
+                    if name not in names and name[:2] != '__':
+                        names.append(name)
+            schema = tuple((name, name[0] == '_') for name in names)
+            SCHEMAS[cls] = schema
+        return schema
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
+        for key, private in self._schema():
+            if private and not for_serialization:
+                continue
+            try:
+                value = getattr(self, key)
+            except AttributeError:
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = value.isoformat(timespec='seconds')
             else:
                 result[key] = value
         return result
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def _lock(cls) -> threading.RLock:
+        """ Return the lock guarding the objects and indexes of the class
+        """
+        with _LOCKS_LOCK:
+            return LOCKS.setdefault(cls.__name__, threading.RLock())
+
+    @classmethod
+    def _index_for(cls) -> dict:
+        """ Return the index tables of the class, creating them if needed
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        if INDEXES.get(s_class) is None:
+            INDEXES[s_class] = {
+                'ids': [],
+                'keys': {},
+                'values': {attr: {} for attr in cls._indexes},
+            }
+        return INDEXES[s_class]
+
+    @classmethod
+    def _index_remove(cls, obj_id: str, forget_id: bool = True):
+        """ Drop an object from every index of the class
+        With forget_id=False, its ID stays in the sorted IDs
+        """
+        index = cls._index_for()
+        keys = index['keys'].pop(obj_id, None)
+        if keys is None:
             return
+        if forget_id:
+            ids = index['ids']
+            i = bisect.bisect_left(ids, obj_id)
+            if i < len(ids) and ids[i] == obj_id:
+                del ids[i]
+        for attr, value in keys.items():
+            ids = index['values'][attr].get(value)
+            if ids is None:
+                continue
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del index['values'][attr][value]
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
+    @classmethod
+    def _index_add(cls, obj: TypeVar('Base'), check: bool = False,
+                   sort_id: bool = True):
+        """ Register an object in every index of the class
+        Unhashable values are left out, searches on them fall back to a scan.
+        With sort_id=False, a new ID is not added to the sorted IDs: the
+        caller sorts them once after adding many objects
+        """
+        index = cls._index_for()
+        keys = {}
+        for attr, unique in cls._indexes.items():
+            value = getattr(obj, attr, None)
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            ids = index['values'][attr].get(value)
+            if check and unique and value is not None and ids and \
+                    any(obj_id != obj.id for obj_id in ids):
+                raise ValueError("{} {} already exists".format(attr, value))
+            keys[attr] = value
+        if obj.id not in index['keys'] and sort_id:
+            bisect.insort(index['ids'], obj.id)
+        cls._index_remove(obj.id, forget_id=False)
+        for attr, value in keys.items():
+            index['values'][attr].setdefault(value, {})[obj.id] = True
+        index['keys'][obj.id] = keys
+
+    @classmethod
+    def load_from_file(cls):
+        """ Load all objects from file
+        """
+        s_class = cls.__name__
+        objs_json = STORAGE.load(s_class)
+        with cls._lock():
+            DATA[s_class] = {}
+            INDEXES.pop(s_class, None)
             for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+                obj = cls(**obj_json)
+                DATA[s_class][obj_id] = obj
+                cls._index_add(obj, sort_id=False)
+            cls._index_for()['ids'] = sorted(DATA[s_class])
 
     @classmethod
-    def save_to_file(cls):
-        """ Save all objects to file
+    def _serialize_all(cls) -> dict:
+        """ Serialize all objects of the class by ID
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
+        for obj_id, obj in list(DATA[s_class].items()):
             objs_json[obj_id] = obj.to_json(True)
+        return objs_json
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def save_to_file(cls):
+        """ Save all objects to file
+        """
+        STORAGE.dump(cls.__name__, cls._serialize_all())
+
+    @staticmethod
+    def flush():
+        """ Write pending changes of every class to storage
+        """
+        if hasattr(STORAGE, 'flush'):
+            STORAGE.flush()
 
-    def save(self):
+    def save(self, persist: bool = True):
         """ Save current object
+        With persist=False, only memory is updated: callers saving many
+        objects persist them all at once with save_to_file()
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with self._lock():
+            self._index_add(self, check=True)
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+        if persist:
+            STORAGE.put(s_class, self.id, self.to_json(True),
+                        self.__class__._serialize_all)
 
-    def remove(self):
+    def remove(self, persist: bool = True):
         """ Remove object
+        With persist=False, only memory is updated, as for save()
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with self._lock():
+            if DATA[s_class].get(self.id) is None:
+                return
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self._index_remove(self.id)
+        if persist:
+            STORAGE.delete(s_class, self.id, self.__class__._serialize_all)
 
     @classmethod
     def count(cls) -> int:
@@ -121,11 +250,27 @@ class Base():
         s_class = cls.__name__
         return DATA[s_class].get(id)
 
+    @classmethod
+    def page(cls, limit: Optional[int] = None,
+             after: Optional[str] = None) -> List[TypeVar('Base')]:
+        """ Return up to limit objects sorted by ID, starting after the
+        given ID: a bisect in the sorted IDs, O(log N + limit)
+        """
+        s_class = cls.__name__
+        with cls._lock():
+            ids = cls._index_for()['ids']
+            start = 0 if after is None else bisect.bisect_right(ids, after)
+            end = len(ids) if limit is None else start + limit
+            objs = DATA[s_class]
+            return [objs[obj_id] for obj_id in ids[start:end]
+                    if obj_id in objs]
+
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
         s_class = cls.__name__
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +278,23 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        with cls._lock():
+            objs = DATA[s_class]
+            candidates = None
+            for k, v in attributes.items():
+                if k not in cls._indexes:
+                    continue
+                try:
+                    ids = cls._index_for()['values'][k].get(v, {})
+                except TypeError:
+                    continue
+                if candidates is None or len(ids) < len(candidates):
+                    candidates = ids
+            if candidates is None:
+                candidates = list(objs.values())
+            else:
+                candidates = [objs[obj_id] for obj_id in candidates
+                              if obj_id in objs]
+
+        return list(filter(_search, candidates))
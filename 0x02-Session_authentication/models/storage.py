@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+""" Storage module
+"""
+from typing import Callable
+from os import getenv, path
+import atexit
+import json
+import os
+import tempfile
+import threading
+
+
+class JSONStorage():
+    """ JSON file storage: every write rewrites `.db_<Class>.json`
+
+    Snapshots are written to a temporary file of their own, synced and
+    renamed over the previous one. With `fsync` set, the directory is
+    synced as well so the rename itself survives a power loss. Writes of
+    a class are serialized by one lock per class.
+    """
+    fsync = False
+
+    def __init__(self):
+        """ Initialize a JSONStorage instance
+        """
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+    def _lock(self, s_class: str) -> threading.RLock:
+        """ Lock of the files of a class
+        """
+        with self.locks_lock:
+            return self.locks.setdefault(s_class, threading.RLock())
+
+    def file_path(self, s_class: str) -> str:
+        """ Path of the snapshot file of a class
+        """
+        return ".db_{}.json".format(s_class)
+
+    def load(self, s_class: str) -> dict:
+        """ Return all serialized objects of a class by ID
+        """
+        file_path = self.file_path(s_class)
+        if not path.exists(file_path):
+            return {}
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
+    def dump(self, s_class: str, objs_json: dict):
+        """ Write all serialized objects of a class to its snapshot file
+        """
+        file_path = self.file_path(s_class)
+        dir_path = path.dirname(path.abspath(file_path))
+        with self._lock(s_class):
+            fd, tmp_path = tempfile.mkstemp(
+                dir=dir_path, prefix="{}.".format(path.basename(file_path)),
+                suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(objs_json, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                if path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if self.fsync:
+                dir_fd = os.open(dir_path, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+    def put(self, s_class: str, obj_id: str, obj_json: dict,
+            snapshot: Callable[[], dict]):
+        """ Persist one created or updated object
+        """
+        with self._lock(s_class):
+            self.dump(s_class, snapshot())
+
+    def delete(self, s_class: str, obj_id: str,
+               snapshot: Callable[[], dict]):
+        """ Persist the removal of one object
+        """
+        with self._lock(s_class):
+            self.dump(s_class, snapshot())
+
+
+class JournalStorage(JSONStorage):
+    """ Append-only journal storage
+
+    Each put/delete appends one JSON line to `.db_<Class>.journal`.
+    Once `compact_every` records have been appended, the journal is folded
+    into the `.db_<Class>.json` snapshot and truncated. Loading reads the
+    snapshot then replays the journal, ignoring a torn last line, and
+    compacts the result so new records never follow a torn one.
+    Appends, compactions and journal truncation of a class share one lock,
+    so no record is appended between a snapshot and the truncation.
+    """
+
+    def __init__(self, compact_every: int = 1000, fsync: bool = True):
+        """ Initialize a JournalStorage instance
+        """
+        super().__init__()
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.records = {}
+
+    def journal_path(self, s_class: str) -> str:
+        """ Path of the journal file of a class
+        """
+        return ".db_{}.journal".format(s_class)
+
+    def load(self, s_class: str) -> dict:
+        """ Return all serialized objects of a class by ID
+        """
+        with self._lock(s_class):
+            objs_json = super().load(s_class)
+            self.records[s_class] = 0
+            journal_path = self.journal_path(s_class)
+            if not path.exists(journal_path):
+                return objs_json
+
+            with open(journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if record.get('op') == 'put':
+                        objs_json[record['id']] = record['obj']
+                    elif record.get('op') == 'delete':
+                        objs_json.pop(record['id'], None)
+            self.dump(s_class, objs_json)
+            return objs_json
+
+    def dump(self, s_class: str, objs_json: dict):
+        """ Write a snapshot of a class and truncate its journal
+        """
+        with self._lock(s_class):
+            super().dump(s_class, objs_json)
+            journal_path = self.journal_path(s_class)
+            if path.exists(journal_path):
+                os.remove(journal_path)
+            self.records[s_class] = 0
+
+    def _append(self, s_class: str, record: dict,
+                snapshot: Callable[[], dict]):
+        """ Append a record to the journal, compacting when it is full
+        """
+        with self._lock(s_class):
+            with open(self.journal_path(s_class), 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self.records[s_class] = self.records.get(s_class, 0) + 1
+            if self.records[s_class] >= self.compact_every:
+                self.dump(s_class, snapshot())
+
+    def put(self, s_class: str, obj_id: str, obj_json: dict,
+            snapshot: Callable[[], dict]):
+        """ Persist one created or updated object
+        """
+        self._append(s_class, {'op': 'put', 'id': obj_id, 'obj': obj_json},
+                     snapshot)
+
+    def delete(self, s_class: str, obj_id: str,
+               snapshot: Callable[[], dict]):
+        """ Persist the removal of one object
+        """
+        self._append(s_class, {'op': 'delete', 'id': obj_id}, snapshot)
+
+
+class WriteBehindStorage():
+    """ Write-behind wrapper around a storage engine
+
+    Writes only mark their class dirty; a background thread writes one
+    snapshot per dirty class every `interval` seconds, or as soon as
+    `threshold` writes are pending. Durability modes:
+    - "grouped": writers block until the flush covering their write is
+      on disk, so no acknowledged write is lost, at the cost of up to
+      `interval` seconds of latency per write (group commit)
+    - "async": writers return at once; a crash loses at most the writes
+      of the last `interval` seconds (or `threshold` writes)
+    A class whose snapshot fails to write stays dirty and is retried on
+    the next flush; "grouped" writers waiting on that flush get the error.
+    """
+
+    def __init__(self, storage: JSONStorage, durability: str = "async",
+                 interval: float = 1.0, threshold: int = 100):
+        """ Initialize a WriteBehindStorage instance
+        """
+        self.storage = storage
+        self.durability = durability
+        self.interval = interval
+        self.threshold = threshold
+        self.dirty = {}
+        self.pending = 0
+        self.started = 0
+        self.generation = 0
+        self.failed = {}
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        """ Flush dirty classes periodically
+        """
+        while True:
+            with self.cond:
+                if self.pending < self.threshold:
+                    self.cond.wait(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self):
+        """ Write a snapshot of every dirty class
+        Once every class was tried, the first write error is raised
+        """
+        with self.flush_lock:
+            with self.cond:
+                dirty, self.dirty = self.dirty, {}
+                self.pending = 0
+                self.started += 1
+                generation = self.started
+            errors = {}
+            for s_class, snapshot in dirty.items():
+                try:
+                    self.storage.dump(s_class, snapshot())
+                except Exception as e:
+                    errors[s_class] = e
+            with self.cond:
+                for s_class in dirty:
+                    if s_class in errors:
+                        self.dirty.setdefault(s_class, dirty[s_class])
+                        self.failed[s_class] = (generation, errors[s_class])
+                    else:
+                        self.failed.pop(s_class, None)
+                self.generation = generation
+                self.cond.notify_all()
+            if errors:
+                raise next(iter(errors.values()))
+
+    def _mark(self, s_class: str, snapshot: Callable[[], dict]):
+        """ Mark a class dirty and wait for durability if required
+        """
+        with self.cond:
+            self.dirty[s_class] = snapshot
+            self.pending += 1
+            generation = self.started + 1
+            if self.pending >= self.threshold:
+                self.cond.notify_all()
+            if self.durability != "grouped":
+                return
+            while self.generation < generation:
+                self.cond.wait()
+            failed = self.failed.get(s_class)
+            if failed is not None and failed[0] >= generation:
+                raise failed[1]
+
+    def load(self, s_class: str) -> dict:
+        """ Return all serialized objects of a class by ID
+        """
+        if s_class in self.dirty:
+            self.flush()
+        return self.storage.load(s_class)
+
+    def dump(self, s_class: str, objs_json: dict):
+        """ Write all serialized objects of a class to its snapshot file
+        """
+        with self.flush_lock:
+            with self.cond:
+                self.dirty.pop(s_class, None)
+            self.storage.dump(s_class, objs_json)
+
+    def put(self, s_class: str, obj_id: str, obj_json: dict,
+            snapshot: Callable[[], dict]):
+        """ Persist one created or updated object
+        """
+        self._mark(s_class, snapshot)
+
+    def delete(self, s_class: str, obj_id: str,
+               snapshot: Callable[[], dict]):
+        """ Persist the removal of one object
+        """
+        self._mark(s_class, snapshot)
+
+
+def get_storage() -> JSONStorage:
+    """ Return the storage engine selected by STORAGE_TYPE and wrapped
+    according to STORAGE_DURABILITY (sync, grouped or async)
+    """
+    if getenv("STORAGE_TYPE") == "journal":
+        try:
+            compact_every = int(getenv("STORAGE_COMPACT_EVERY", 1000))
+        except ValueError:
+            compact_every = 1000
+        fsync = getenv("STORAGE_FSYNC", "1") != "0"
+        storage = JournalStorage(compact_every, fsync)
+    else:
+        storage = JSONStorage()
+
+    durability = getenv("STORAGE_DURABILITY", "sync")
+    if durability not in ("grouped", "async"):
+        return storage
+    try:
+        interval = float(getenv("STORAGE_FLUSH_INTERVAL", 1.0))
+    except ValueError:
+        interval = 1.0
+    try:
+        threshold = int(getenv("STORAGE_FLUSH_THRESHOLD", 100))
+    except ValueError:
+        threshold = 100
+    return WriteBehindStorage(storage, durability, interval, threshold)
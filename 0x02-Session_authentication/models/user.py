@@ -8,6 +8,8 @@ from models.base import Base
 class User(Base):
     """ User class
     """
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    _indexes = {'email': True, 'first_name': False, 'last_name': False}
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
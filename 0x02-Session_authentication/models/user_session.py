@@ -9,6 +9,8 @@ class UserSession(Base):
     """
     UserSession class for managing session storage in a file (database).
     """
+    __slots__ = ('user_id', 'session_id')
+    _indexes = {'session_id': True, 'user_id': False}
 
     def __init__(self, *args: list, **kwargs: dict):
         """
@@ -5,12 +5,34 @@ Basic Flask app for user registration.
 
 from flask import Flask, request, jsonify, abort, make_response, redirect
 from auth import Auth
+from hashing import HashingSaturated
 
 app = Flask(__name__)
 
 AUTH = Auth()
 
 
+@app.errorhandler(HashingSaturated)
+def busy(error) -> str:
+    """
+    Reject requests while the password hashing pool is saturated.
+
+    Returns:
+        Response: 503 JSON response with a Retry-After header.
+    """
+    response = jsonify({"message": "service busy"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@app.teardown_appcontext
+def remove_session(exception=None) -> None:
+    """
+    Release the database session of the request's thread.
+    """
+    AUTH.remove_db_session()
+
+
 @app.route("/", methods=["GET"])
 def welcome():
     """
@@ -79,7 +101,7 @@ def logout():
     if user is None:
         abort(403)
 
-    AUTH.destroy_session(user.id)
+    AUTH.destroy_session(user.id, session_id)
     return redirect("/", code=302)
 
 
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+ASGI variant of the user authentication service.
+
+Serves the same routes as app.py through AsyncAuth, without a web
+framework, e.g.:
+    uvicorn asgi:app --port 5000
+"""
+
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+import json
+from async_auth import AsyncAuth
+from hashing import HashingSaturated
+
+# Built once at import, like app.AUTH: migrations run synchronously
+# before the server starts accepting connections
+AUTH = AsyncAuth()
+
+
+class Request:
+    """Form fields and cookies of an incoming request."""
+
+    def __init__(self, scope: dict, body: bytes) -> None:
+        """Parse the url-encoded form body and the Cookie header."""
+        self.form = {key: values[0] for key, values
+                     in parse_qs(body.decode('utf-8')).items()}
+        cookie = SimpleCookie()
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookie.load(value.decode('latin-1'))
+        self.cookies = {key: morsel.value for key, morsel in cookie.items()}
+
+
+Response = Tuple[int, Optional[dict], Dict[str, str]]
+
+
+def abort(status: int) -> Response:
+    """
+    Error response with the status phrase as JSON body.
+    """
+    return status, {"message": HTTPStatus(status).phrase}, {}
+
+
+async def welcome(request: Request) -> Response:
+    """GET /"""
+    return 200, {"message": "Bienvenue"}, {}
+
+
+async def users(request: Request) -> Response:
+    """POST /users"""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    try:
+        user = await AUTH.register_user(email, password)
+        return 200, {"email": user.email, "message": "user created"}, {}
+    except ValueError:
+        return 400, {"message": "email already registered"}, {}
+
+
+async def login(request: Request) -> Response:
+    """POST /sessions"""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if not await AUTH.valid_login(email, password):
+        return abort(401)
+    session_id = await AUTH.create_session(email)
+    if not session_id:
+        return abort(401)
+    return 200, {"email": email, "message": "logged in"}, {
+        "set-cookie": f"session_id={session_id}; Path=/"}
+
+
+async def logout(request: Request) -> Response:
+    """DELETE /sessions"""
+    session_id = request.cookies.get("session_id")
+    if session_id is None:
+        return abort(403)
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return abort(403)
+    await AUTH.destroy_session(user.id, session_id)
+    return 302, None, {"location": "/"}
+
+
+async def profile(request: Request) -> Response:
+    """GET /profile"""
+    session_id = request.cookies.get("session_id")
+    if session_id is None:
+        return abort(403)
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return abort(403)
+    return 200, {"email": user.email}, {}
+
+
+async def reset_password(request: Request) -> Response:
+    """POST /reset_password"""
+    email = request.form.get("email")
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+        return 200, {"email": email, "reset_token": reset_token}, {}
+    except ValueError:
+        return abort(403)
+
+
+async def update_password(request: Request) -> Response:
+    """PUT /reset_password"""
+    email = request.form.get("email")
+    try:
+        await AUTH.update_password(request.form.get("reset_token"),
+                                   request.form.get("new_password"))
+        return 200, {"email": email, "message": "Password updated"}, {}
+    except ValueError:
+        return abort(403)
+
+
+ROUTES: Dict[Tuple[str, str], Callable] = {
+    ("GET", "/"): welcome,
+    ("POST", "/users"): users,
+    ("POST", "/sessions"): login,
+    ("DELETE", "/sessions"): logout,
+    ("GET", "/profile"): profile,
+    ("POST", "/reset_password"): reset_password,
+    ("PUT", "/reset_password"): update_password,
+}
+
+
+async def _read_body(receive: Callable) -> bytes:
+    """Read the whole request body."""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _lifespan(receive: Callable, send: Callable) -> None:
+    """Acknowledge startup and shutdown, AUTH being built at import."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: dict, receive: Callable, send: Callable) -> None:
+    """
+    ASGI entry point.
+    """
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+
+    body = await _read_body(receive)
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        status, payload, headers = abort(404)
+    else:
+        try:
+            status, payload, headers = await handler(Request(scope, body))
+        except HashingSaturated:
+            status, payload, headers = 503, {"message": "service busy"}, {
+                "retry-after": "1"}
+
+    content = b"" if payload is None else json.dumps(payload).encode()
+    raw_headers = [(b"content-type", b"application/json"),
+                   (b"content-length", str(len(content)).encode())]
+    raw_headers += [(name.encode(), value.encode())
+                    for name, value in headers.items()]
+    await send({"type": "http.response.start", "status": status,
+                "headers": raw_headers})
+    await send({"type": "http.response.body", "body": content})
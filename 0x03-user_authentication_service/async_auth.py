@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Async Auth module: the Auth workflow on top of AsyncDB
+"""
+
+from typing import Optional, Union
+import asyncio
+import bcrypt
+from sqlalchemy.orm.exc import NoResultFound
+from async_db import AsyncDB
+from auth import AuthBase, _generate_uuid, _hash_password
+from hashing import HashingExecutor, HashingSaturated
+from session_cache import SessionCacheBackend, SessionUser
+from user import User
+
+
+class AsyncAuth(AuthBase):
+    """
+    Counterpart of Auth whose public methods are coroutines.
+
+    Database calls go through AsyncDB and bcrypt runs in the hashing pool
+    when one is configured, in the default executor otherwise. The rehash
+    policy, session expiry and session cache handling come from AuthBase,
+    shared with Auth.
+    """
+
+    def __init__(self, hasher: Optional[HashingExecutor] = None,
+                 session_cache: Optional[SessionCacheBackend] = None,
+                 db: Optional[AsyncDB] = None):
+        """Initialize the AsyncAuth instance."""
+        super().__init__(db if db is not None else AsyncDB(), hasher,
+                         session_cache)
+
+    async def _hash(self, password: str) -> bytes:
+        """
+        Hash a password off the event loop.
+
+        Raises:
+            HashingSaturated: If the hashing pool is full.
+        """
+        if self._hasher is not None:
+            return await self._hasher.hash_password_async(password)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _hash_password, password)
+
+    async def _check(self, password: str, hashed_password: bytes) -> bool:
+        """
+        Check a password off the event loop.
+
+        Raises:
+            HashingSaturated: If the hashing pool is full.
+        """
+        if self._hasher is not None:
+            return await self._hasher.check_password_async(
+                password, hashed_password)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, bcrypt.checkpw, password.encode('utf-8'), hashed_password)
+
+    async def register_user(self, email: str, password: str) -> User:
+        """
+        Register a new user with the provided email and password.
+
+        Raises:
+            ValueError: If a user with the same email already exists.
+        """
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError(f"User {email} already exists")
+        except NoResultFound:
+            hashed_password = await self._hash(password)
+            return await self._db.add_user(email, hashed_password)
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """
+        Validate a user's login credentials, rehashing the password when
+        its cost factor is not the configured one.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+            if await self._check(password, user.hashed_password):
+                if self._needs_rehash(user.hashed_password):
+                    try:
+                        await self._db.update_users_by(
+                            {"id": user.id},
+                            hashed_password=await self._hash(password))
+                    except HashingSaturated:
+                        pass
+                return True
+        except NoResultFound:
+            pass
+        return False
+
+    async def create_session(self, email: str) -> Union[None, str]:
+        """
+        Create a session ID for a user identified by their email.
+        """
+        session_id = _generate_uuid()
+        if not await self._db.add_session(email, session_id,
+                                          self._session_expiry()):
+            return None
+        return session_id
+
+    async def get_user_from_session_id(
+            self, session_id: Optional[str]) -> Optional[SessionUser]:
+        """
+        Get a user from a given session ID, through the session cache.
+        """
+        if session_id is None:
+            return None
+
+        cached = self._cached_session(session_id)
+        if cached is not None:
+            return cached
+
+        token = self._fill_token()
+        try:
+            user, expires_at = await self._db.find_session(session_id)
+        except NoResultFound:
+            return None
+
+        return self._cache_session(session_id, user, expires_at, token)
+
+    async def destroy_session(self, user_id: int,
+                              session_id: Optional[str] = None) -> None:
+        """
+        Destroy one session of a user, or all of them when no session ID
+        is given.
+        """
+        await self._db.delete_sessions_by(
+            **self._session_filters(user_id, session_id))
+        self._forget_sessions(user_id, session_id)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """
+        Generate a password reset token for a user.
+
+        Raises:
+            ValueError: If the user does not exist.
+        """
+        reset_token = _generate_uuid()
+        if await self._db.update_users_by({"email": email},
+                                          reset_token=reset_token) == 0:
+            raise ValueError(f"User with email {email} does not exist")
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """
+        Update a user's password using a reset token.
+
+        Raises:
+            ValueError: If the reset token is invalid or does not exist.
+        """
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError("Invalid reset token")
+
+        hashed_password = await self._hash(password)
+        if await self._db.update_users_by(
+                {"id": user.id, "reset_token": reset_token},
+                hashed_password=hashed_password, reset_token=None) == 0:
+            raise ValueError("Invalid reset token")
+        self._forget_sessions(user.id)
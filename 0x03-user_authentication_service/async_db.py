@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Async DB module for interacting with the database from asyncio code.
+"""
+
+from datetime import datetime
+from os import getenv
+from typing import Optional, Tuple
+from sqlalchemy import (delete, func, insert, literal, or_, select,
+                        update)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import NoResultFound
+from db import LAST_SEEN_INTERVAL, USER_COLUMNS, _create_engine
+from migrations import migrate
+from user import Base, User, UserSession
+
+
+class AsyncDB:
+    """
+    AsyncDB class for handling database operations without blocking the
+    event loop. It mirrors the DB methods used by authentication; each
+    call runs in its own short-lived session.
+    """
+
+    def __init__(self, url: Optional[str] = None,
+                 reset: Optional[bool] = None) -> None:
+        """
+        Initialize a new AsyncDB instance.
+
+        The URL defaults to DB_ASYNC_URL, then to sqlite+aiosqlite:///a.db.
+        Migrations run through a synchronous engine on the same database,
+        so call this before the event loop starts serving requests.
+        """
+        url = url or getenv("DB_ASYNC_URL", "sqlite+aiosqlite:///a.db")
+        sync_url = make_url(url)
+        sync_url = sync_url.set(drivername=sync_url.get_backend_name())
+        sync_engine = _create_engine(
+            sync_url.render_as_string(hide_password=False))
+        if reset is None:
+            reset = getenv("DB_RESET") == "1"
+        if reset:
+            Base.metadata.drop_all(sync_engine)
+        migrate(sync_engine)
+        sync_engine.dispose()
+
+        self._engine = create_async_engine(url, echo=False)
+        self._sessionmaker = async_sessionmaker(self._engine,
+                                                expire_on_commit=False)
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """
+        Add a new user to the database.
+        Returns:
+            User: The newly created User object.
+        """
+        new_user = User(email=email, hashed_password=hashed_password)
+        async with self._sessionmaker() as session:
+            session.add(new_user)
+            await session.commit()
+        return new_user
+
+    async def find_user_by(self, **kwargs) -> User:
+        """
+        Find a user by arbitrary keyword arguments.
+
+        Raises:
+            NoResultFound: If no user matches the filter.
+            InvalidRequestError: If invalid query arguments are provided.
+        """
+        if not kwargs:
+            raise InvalidRequestError("No arguments provided for query")
+        if not USER_COLUMNS.issuperset(kwargs):
+            raise InvalidRequestError("Invalid arguments for query")
+
+        async with self._sessionmaker() as session:
+            result = await session.execute(
+                select(User).filter_by(**kwargs))
+            try:
+                return result.scalar_one()
+            except NoResultFound:
+                raise NoResultFound("No user found with the given parameters")
+
+    async def update_users_by(self, filters: dict, **kwargs) -> int:
+        """
+        Update the users matching filters with a single UPDATE statement.
+        Without values, the matching users are only counted.
+
+        Returns:
+            int: The number of updated (or matching) users.
+
+        Raises:
+            ValueError: argument does not correspond to a valid user attribute
+        """
+        for key in list(filters) + list(kwargs):
+            if key not in USER_COLUMNS:
+                raise ValueError(f"Attribute {key} does not exist on User")
+        if not filters:
+            raise ValueError("Filters are required")
+        if not kwargs:
+            async with self._sessionmaker() as session:
+                result = await session.execute(
+                    select(func.count()).select_from(User).filter_by(
+                        **filters))
+                return result.scalar()
+
+        async with self._sessionmaker() as session:
+            result = await session.execute(
+                update(User).filter_by(**filters).values(**kwargs))
+            await session.commit()
+        return result.rowcount
+
+    async def add_session(self, email: str, session_id: str,
+                          expires_at: Optional[datetime] = None) -> bool:
+        """
+        Open a session for the user with this email.
+
+        Returns:
+            bool: True if the session was created, False if no user has
+                this email.
+        """
+        now = datetime.utcnow()
+        query = select(
+            literal(session_id), User.id, literal(now),
+            literal(expires_at, UserSession.expires_at.type), literal(now)
+        ).where(User.email == email)
+        async with self._sessionmaker() as session:
+            result = await session.execute(insert(UserSession).from_select(
+                ["session_id", "user_id", "created_at", "expires_at",
+                 "last_seen"], query))
+            await session.commit()
+        return result.rowcount > 0
+
+    async def find_session(self, session_id: str
+                           ) -> Tuple[User, Optional[datetime]]:
+        """
+        Find the user of an unexpired session by primary key lookup.
+
+        Returns:
+            tuple: The user owning the session and the session expiry.
+
+        Raises:
+            NoResultFound: If the session does not exist or has expired.
+        """
+        now = datetime.utcnow()
+        query = select(
+            User, UserSession.last_seen, UserSession.expires_at).join(
+            UserSession, UserSession.user_id == User.id).where(
+            UserSession.session_id == session_id,
+            or_(UserSession.expires_at.is_(None),
+                UserSession.expires_at > now))
+        async with self._sessionmaker() as session:
+            result = await session.execute(query)
+            try:
+                user, last_seen, expires_at = result.one()
+            except NoResultFound:
+                raise NoResultFound("No user found with the given parameters")
+            if now - last_seen > LAST_SEEN_INTERVAL:
+                await session.execute(update(UserSession).where(
+                    UserSession.session_id == session_id).values(
+                    last_seen=now))
+                await session.commit()
+        return user, expires_at
+
+    async def delete_sessions_by(self, **kwargs) -> int:
+        """
+        Delete the sessions matching the filters.
+
+        Returns:
+            int: The number of deleted sessions.
+        """
+        if not kwargs:
+            raise InvalidRequestError("No arguments provided for query")
+        async with self._sessionmaker() as session:
+            result = await session.execute(
+                delete(UserSession).filter_by(**kwargs))
+            await session.commit()
+        return result.rowcount
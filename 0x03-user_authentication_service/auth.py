@@ -3,9 +3,17 @@
 Auth module for password hashing and user registration
 """
 
-from typing import Union, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from os import cpu_count, getenv
+from typing import Any, Iterable, List, Tuple, Union, Optional
 from user import User
 from db import DB
+from hashing import (HashingExecutor, HashingSaturated, get_executor,
+                     get_rounds, hash_rounds)
+from session_cache import (SessionCacheBackend, SessionUser,
+                           get_session_cache)
 import bcrypt
 from sqlalchemy.orm.exc import NoResultFound
 import uuid
@@ -18,7 +26,7 @@ def _hash_password(password: str) -> bytes:
     Returns:
         bytes: The salted hash of the input password.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(get_rounds())
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed
 
@@ -33,12 +41,145 @@ def _generate_uuid() -> str:
     return str(uuid.uuid4())
 
 
-class Auth:
+class AuthBase:
+    """
+    State and decisions shared by Auth and AsyncAuth: hashing pool, rehash
+    policy, session expiry and session cache handling. Subclasses add the
+    workflow methods, as plain functions or as coroutines.
+    """
+
+    def __init__(self, db: Any, hasher: Optional[HashingExecutor] = None,
+                 session_cache: Optional[SessionCacheBackend] = None):
+        """Initialize the shared state over a database object."""
+        self._db = db
+        self._hasher = hasher if hasher is not None else get_executor()
+        self._session_cache = get_session_cache(session_cache)
+        try:
+            self.session_duration = int(getenv("SESSION_DURATION", 0))
+        except ValueError:
+            self.session_duration = 0
+
+    @staticmethod
+    def _needs_rehash(hashed_password: bytes) -> bool:
+        """
+        Whether a valid password should be hashed again, its hash having
+        been made with another cost factor than the configured one.
+        """
+        return hash_rounds(hashed_password) != get_rounds()
+
+    def _session_expiry(self) -> Optional[datetime]:
+        """
+        Expiry time of a session created now.
+
+        Returns:
+            datetime: UTC expiry, or None when SESSION_DURATION is unset.
+        """
+        if self.session_duration <= 0:
+            return None
+        return datetime.utcnow() + timedelta(seconds=self.session_duration)
+
+    def _fill_token(self) -> Optional[int]:
+        """
+        Token to take before reading a session from the database, so that
+        caching the result is skipped if a session was invalidated
+        meanwhile.
+        """
+        if self._session_cache is None:
+            return None
+        return self._session_cache.fill_token()
+
+    def _cache_session(self, session_id: str, user: User,
+                       expires_at: Optional[datetime],
+                       token: Optional[int] = None) -> SessionUser:
+        """
+        Snapshot the user of a session and cache it until its expiry,
+        unless a session was invalidated since token was taken.
+
+        Returns:
+            SessionUser: The snapshot.
+        """
+        snapshot = SessionUser(user.id, user.email)
+        if self._session_cache is not None:
+            ttl = None
+            if expires_at is not None:
+                ttl = (expires_at - datetime.utcnow()).total_seconds()
+            self._session_cache.set(session_id, snapshot, ttl, token)
+        return snapshot
+
+    def _forget_sessions(self, user_id: int,
+                         session_id: Optional[str] = None) -> None:
+        """
+        Drop one cached session, or every cached session of a user.
+        """
+        if self._session_cache is None:
+            return
+        if session_id is None:
+            self._session_cache.delete_user(user_id)
+        else:
+            self._session_cache.delete(session_id)
+
+    @staticmethod
+    def _session_filters(user_id: int,
+                         session_id: Optional[str] = None) -> dict:
+        """
+        Filters selecting one session of a user, or all of them when no
+        session ID is given.
+        """
+        if session_id is None:
+            return {"user_id": user_id}
+        return {"user_id": user_id, "session_id": session_id}
+
+    def _cached_session(self, session_id: str) -> Optional[SessionUser]:
+        """
+        Snapshot of a session from the session cache, or None.
+        """
+        if self._session_cache is None:
+            return None
+        return self._session_cache.get(session_id)
+
+    def session_cache_stats(self) -> dict:
+        """
+        Hit and miss counters of the session cache.
+
+        Returns:
+            dict: The counters, empty when the cache is disabled.
+        """
+        if self._session_cache is None:
+            return {}
+        return self._session_cache.stats()
+
+
+class Auth(AuthBase):
     """Auth class to interact with the authentication database."""
 
-    def __init__(self):
+    def __init__(self, hasher: Optional[HashingExecutor] = None,
+                 session_cache: Optional[SessionCacheBackend] = None,
+                 db: Any = None):
         """Initialize the Auth instance."""
-        self._db = DB()
+        super().__init__(db if db is not None else DB(), hasher,
+                         session_cache)
+
+    def _hash(self, password: str) -> bytes:
+        """
+        Hash a password, in the hashing pool when one is configured.
+
+        Raises:
+            HashingSaturated: If the hashing pool is full.
+        """
+        if self._hasher is None:
+            return _hash_password(password)
+        return self._hasher.hash_password(password)
+
+    def _check(self, password: str, hashed_password: bytes) -> bool:
+        """
+        Check a password, in the hashing pool when one is configured.
+
+        Raises:
+            HashingSaturated: If the hashing pool is full.
+        """
+        if self._hasher is None:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+        return self._hasher.check_password(password, hashed_password)
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -54,20 +195,72 @@ class Auth:
             self._db.find_user_by(email=email)
             raise ValueError(f"User {email} already exists")
         except NoResultFound:
-            hashed_password = _hash_password(password)
+            hashed_password = self._hash(password)
             new_user = self._db.add_user(email, hashed_password)
             return new_user
 
+    def _hash_many(self, passwords: List[str]) -> List[bytes]:
+        """
+        Hash many passwords in parallel: in the hashing pool when one is
+        configured, else on one thread per core (bcrypt releases the GIL).
+
+        Returns:
+            list: The salted hashes, in the order of the passwords.
+        """
+        if self._hasher is not None:
+            return self._hasher.hash_passwords(passwords)
+        with ThreadPoolExecutor(max_workers=cpu_count() or 1) as pool:
+            return list(pool.map(_hash_password, passwords))
+
+    def register_users(self, users: Iterable[Tuple[str, str]],
+                       batch_size: int = 1000) -> Tuple[int, int]:
+        """
+        Register many (email, password) pairs, batch_size at a time.
+
+        Each batch costs one IN query for registered emails, parallel
+        bcrypt hashes of the new passwords and one bulk INSERT. Duplicate
+        emails are skipped.
+
+        Returns:
+            tuple: The numbers of created and skipped users.
+        """
+        created = skipped = 0
+        users = iter(users)
+        while True:
+            batch = list(islice(users, batch_size))
+            if not batch:
+                return created, skipped
+            existing = self._db.existing_emails(email for email, _ in batch)
+            new_users = [(email, password) for email, password in batch
+                         if email not in existing]
+            skipped += len(batch) - len(new_users)
+            hashes = self._hash_many(
+                [password for _, password in new_users])
+            duplicates = self._db.add_users_bulk(
+                zip([email for email, _ in new_users], hashes), existing)
+            created += len(new_users) - len(duplicates)
+            skipped += len(duplicates)
+
     def valid_login(self, email: str, password: str) -> bool:
         """
         Validate a user's login credentials.
 
+        A valid password whose hash was made with another cost factor than
+        the configured one is rehashed at the current cost, unless the
+        hashing pool is full: the upgrade then waits for a later login.
+
         Returns:
             bool: True if login credentials are valid, False otherwise.
         """
         try:
             user = self._db.find_user_by(email=email)
-            if bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
+            if self._check(password, user.hashed_password):
+                if self._needs_rehash(user.hashed_password):
+                    try:
+                        self._db.update_user(
+                            user.id, hashed_password=self._hash(password))
+                    except HashingSaturated:
+                        pass
                 return True
         except NoResultFound:
             pass
@@ -80,44 +273,58 @@ class Auth:
         Returns:
             str: The session ID if the user exists, None otherwise.
         """
-        try:
-            user = self._db.find_user_by(email=email)
-
-        except NoResultFound:
-            return None
-
         session_id = _generate_uuid()
-        self._db.update_user(user.id, session_id=session_id)
+        if not self._db.add_session(email, session_id,
+                                    self._session_expiry()):
+            return None
         return session_id
 
-    def get_user_from_session_id(self,
-                                 session_id: Optional[str]) -> Optional[User]:
+    def get_user_from_session_id(
+            self, session_id: Optional[str]) -> Optional[SessionUser]:
         """
-        Get a user from a given session ID.
+        Get a user from a given session ID, through the session cache.
 
         Returns:
-            User: The user corresponding to the session ID, or None.
+            SessionUser: The id and email of the user owning the session,
+                or None.
         """
         if session_id is None:
             return None
 
+        cached = self._cached_session(session_id)
+        if cached is not None:
+            return cached
+
+        token = self._fill_token()
         try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user
+            user, expires_at = self._db.find_session(session_id)
         except NoResultFound:
             return None
 
-    def destroy_session(self, user_id: int) -> None:
+        return self._cache_session(session_id, user, expires_at, token)
+
+    def remove_db_session(self) -> None:
         """
-        Destroy a user's session by setting their session_id to None.
+        Release the database session of the current thread, e.g. at the
+        end of a request.
 
         Returns:
             None
         """
-        try:
-            self._db.update_user(user_id, session_id=None)
-        except NoResultFound:
-            pass
+        self._db.remove_session()
+
+    def destroy_session(self, user_id: int,
+                        session_id: Optional[str] = None) -> None:
+        """
+        Destroy one session of a user, or all of them when no session ID
+        is given (log out everywhere).
+
+        Returns:
+            None
+        """
+        self._db.delete_sessions_by(
+            **self._session_filters(user_id, session_id))
+        self._forget_sessions(user_id, session_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """
@@ -129,16 +336,11 @@ class Auth:
         Raises:
             ValueError: If the user does not exist.
         """
-        try:
-            user = self._db.find_user_by(email=email)
-
-            reset_token = _generate_uuid()
-
-            self._db.update_user(user.id, reset_token=reset_token)
-
-            return reset_token
-        except NoResultFound:
+        reset_token = _generate_uuid()
+        if self._db.update_users_by({"email": email},
+                                    reset_token=reset_token) == 0:
             raise ValueError(f"User with email {email} does not exist")
+        return reset_token
 
     def update_password(self, reset_token: str, password: str) -> None:
         """
@@ -153,9 +355,12 @@ class Auth:
         try:
             user = self._db.find_user_by(reset_token=reset_token)
 
-            hashed_password = _hash_password(password)
-
-            self._db.update_user(
-                user.id, hashed_password=hashed_password, reset_token=None)
+            hashed_password = self._hash(password)
         except NoResultFound:
             raise ValueError("Invalid reset token")
+
+        if self._db.update_users_by(
+                {"id": user.id, "reset_token": reset_token},
+                hashed_password=hashed_password, reset_token=None) == 0:
+            raise ValueError("Invalid reset token")
+        self._forget_sessions(user.id)
@@ -3,13 +3,61 @@
 DB module for interacting with the database.
 """
 
-from sqlalchemy.exc import InvalidRequestError
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
-from sqlalchemy import create_engine
+from sqlalchemy import (create_engine, event, inspect, insert, literal,
+                        or_, select)
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from user import Base, User
+from sqlalchemy.orm import scoped_session, sessionmaker
+from migrations import migrate
+from user import Base, User, UserSession
+
+USER_COLUMNS = frozenset(column.key for column in inspect(User).column_attrs)
+LAST_SEEN_INTERVAL = timedelta(minutes=1)
+
+
+def _create_engine(url: str) -> Engine:
+    """
+    Create the engine for a database URL.
+
+    SQLite connections are shared across threads and switched to WAL
+    journaling. The connection pool is sized by DB_POOL_SIZE and
+    DB_MAX_OVERFLOW, except for in-memory SQLite databases, which live
+    in a single connection. DB_POOL_PRE_PING=0 disables the liveness
+    check done when a connection is checked out.
+    """
+    sqlite = url.startswith("sqlite")
+    in_memory = sqlite and make_url(url).database in (None, "", ":memory:")
+    options = {"echo": False,
+               "pool_pre_ping": getenv("DB_POOL_PRE_PING", "1") != "0"}
+    if sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    if not in_memory:
+        try:
+            options["pool_size"] = int(getenv("DB_POOL_SIZE", 5))
+        except ValueError:
+            options["pool_size"] = 5
+        try:
+            options["max_overflow"] = int(getenv("DB_MAX_OVERFLOW", 10))
+        except ValueError:
+            options["max_overflow"] = 10
+    engine = create_engine(url, **options)
+
+    if sqlite and not in_memory:
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            """Enable WAL journaling on each new SQLite connection."""
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+    return engine
 
 
 class DB:
@@ -17,24 +65,37 @@ class DB:
     DB class for handling database operations.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, url: Optional[str] = None,
+                 reset: Optional[bool] = None) -> None:
         """
         Initialize a new DB instance, setting up the database and session.
+
+        The database URL defaults to DB_URL, then to sqlite:///a.db.
+        Existing data is kept and pending migrations are applied, unless
+        reset (default: DB_RESET=1) drops every table first, e.g. for tests.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        self._engine = _create_engine(
+            url or getenv("DB_URL", "sqlite:///a.db"))
+        if reset is None:
+            reset = getenv("DB_RESET") == "1"
+        if reset:
+            Base.metadata.drop_all(self._engine)
+        migrate(self._engine)
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
         """
-        Memoized session object for database interactions.
+        Session object of the current thread for database interactions.
+        """
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """
+        Close the session of the current thread, e.g. at the end of a
+        request, returning its connection to the pool.
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """
@@ -47,6 +108,61 @@ class DB:
         self._session.commit()
         return new_user
 
+    def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """
+        Find which of the given emails are registered, in one IN query.
+
+        Returns:
+            set: The registered emails.
+        """
+        emails = list(emails)
+        if not emails:
+            return set()
+        query = select(User.email).where(User.email.in_(emails))
+        return set(self._session.execute(query).scalars())
+
+    def add_users_bulk(self, users: Iterable[Tuple[str, bytes]],
+                       existing: Optional[Set[str]] = None) -> List[str]:
+        """
+        Insert (email, hashed_password) pairs with one executemany INSERT
+        in a single transaction.
+
+        Emails already registered, or repeated within the batch, are
+        skipped. Registered emails are looked up with one IN query, unless
+        the caller already did and passes them as existing. If another
+        writer registers one of the emails meanwhile, the batch is
+        inserted again row by row, skipping the conflicting emails.
+
+        Returns:
+            list: The emails that were skipped as duplicates.
+        """
+        users = list(users)
+        if existing is None:
+            existing = self.existing_emails(email for email, _ in users)
+        seen = set(existing)
+        rows, skipped = [], []
+        for email, hashed_password in users:
+            if email in seen:
+                skipped.append(email)
+                continue
+            seen.add(email)
+            rows.append({"email": email, "hashed_password": hashed_password})
+        if not rows:
+            return skipped
+        try:
+            self._session.execute(insert(User), rows)
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            for row in rows:
+                try:
+                    with self._session.begin_nested():
+                        self._session.execute(insert(User), row)
+                except IntegrityError:
+                    skipped.append(row["email"])
+            self._session.commit()
+        return skipped
+
     def find_user_by(self, **kwargs) -> User:
         """
         Find a user by arbitrary keyword arguments.
@@ -69,6 +185,31 @@ class DB:
         except InvalidRequestError:
             raise InvalidRequestError("Invalid arguments for query")
 
+    def update_users_by(self, filters: dict, **kwargs) -> int:
+        """
+        Update the users matching filters with a single UPDATE statement
+        and commit, without loading them first. Without values, nothing is
+        written and the matching users are only counted.
+
+        Returns:
+            int: The number of updated (or matching) users.
+
+        Raises:
+            ValueError: argument does not correspond to a valid user attribute
+        """
+        for key in list(filters) + list(kwargs):
+            if key not in USER_COLUMNS:
+                raise ValueError(f"Attribute {key} does not exist on User")
+        if not filters:
+            raise ValueError("Filters are required")
+        if not kwargs:
+            return self._session.query(User).filter_by(**filters).count()
+
+        count = self._session.query(User).filter_by(**filters).update(
+            kwargs, synchronize_session=False)
+        self._session.commit()
+        return count
+
     def update_user(self, user_id: int, **kwargs) -> None:
         """
         Update a user's attributes and commit changes to the database.
@@ -78,12 +219,87 @@ class DB:
 
         Raises:
             ValueError: argument does not correspond to a valid user attribute
+            NoResultFound: If no user has this id.
         """
-        user = self.find_user_by(id=user_id)
+        if self.update_users_by({"id": user_id}, **kwargs) == 0:
+            raise NoResultFound("No user found with the given parameters")
 
-        for key, value in kwargs.items():
-            if not hasattr(user, key):
-                raise ValueError(f"Attribute {key} does not exist on User")
-            setattr(user, key, value)
+    def add_session(self, email: str, session_id: str,
+                    expires_at: Optional[datetime] = None) -> bool:
+        """
+        Open a session for the user with this email, with a single
+        INSERT ... SELECT statement.
+
+        Returns:
+            bool: True if the session was created, False if no user has
+                this email.
+        """
+        now = datetime.utcnow()
+        query = select(
+            literal(session_id), User.id, literal(now),
+            literal(expires_at, UserSession.expires_at.type), literal(now)
+        ).where(User.email == email)
+        result = self._session.execute(insert(UserSession).from_select(
+            ["session_id", "user_id", "created_at", "expires_at",
+             "last_seen"], query))
+        self._session.commit()
+        return result.rowcount > 0
+
+    def find_session(self, session_id: str
+                     ) -> Tuple[User, Optional[datetime]]:
+        """
+        Find the user of an unexpired session by primary key lookup.
+
+        The session's last_seen time is refreshed at most once every
+        LAST_SEEN_INTERVAL, so most lookups are a single SELECT.
+
+        Returns:
+            tuple: The user owning the session and the session expiry.
+
+        Raises:
+            NoResultFound: If the session does not exist or has expired.
+        """
+        now = datetime.utcnow()
+        query = self._session.query(
+            User, UserSession.last_seen, UserSession.expires_at).join(
+            UserSession, UserSession.user_id == User.id).filter(
+            UserSession.session_id == session_id,
+            or_(UserSession.expires_at.is_(None),
+                UserSession.expires_at > now))
+        try:
+            user, last_seen, expires_at = query.one()
+        except NoResultFound:
+            raise NoResultFound("No user found with the given parameters")
+        if now - last_seen > LAST_SEEN_INTERVAL:
+            self._session.query(UserSession).filter_by(
+                session_id=session_id).update(
+                {"last_seen": now}, synchronize_session=False)
+            self._session.commit()
+        return user, expires_at
 
+    def find_user_by_session(self, session_id: str) -> User:
+        """
+        Find the user of an unexpired session.
+
+        Returns:
+            User: The user owning the session.
+
+        Raises:
+            NoResultFound: If the session does not exist or has expired.
+        """
+        return self.find_session(session_id)[0]
+
+    def delete_sessions_by(self, **kwargs) -> int:
+        """
+        Delete the sessions matching the filters, e.g. user_id to log a
+        user out everywhere.
+
+        Returns:
+            int: The number of deleted sessions.
+        """
+        if not kwargs:
+            raise InvalidRequestError("No arguments provided for query")
+        count = self._session.query(UserSession).filter_by(
+            **kwargs).delete(synchronize_session=False)
         self._session.commit()
+        return count
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Hashing module: bcrypt cost configuration and a bounded process pool
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from threading import BoundedSemaphore
+from typing import Iterable, List, Optional
+import asyncio
+import json
+import os
+import sys
+import time
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+
+
+class HashingSaturated(Exception):
+    """Raised when the hashing pool has no room for more work."""
+
+
+def _config_path() -> str:
+    """
+    Path of the bcrypt configuration file.
+    """
+    return os.getenv("BCRYPT_CONFIG", ".bcrypt.json")
+
+
+def get_rounds() -> int:
+    """
+    Target bcrypt cost factor.
+
+    Read from BCRYPT_ROUNDS, then from the configuration file written by
+    save_rounds, falling back to the bcrypt library default.
+
+    Returns:
+        int: The cost factor to hash new passwords with.
+    """
+    try:
+        return int(os.environ["BCRYPT_ROUNDS"])
+    except (KeyError, ValueError):
+        return _config_rounds(_config_path())
+
+
+@lru_cache(maxsize=8)
+def _config_rounds(config_path: str) -> int:
+    """
+    Cost factor stored in a configuration file, read once per path.
+
+    Returns:
+        int: The stored cost factor, or DEFAULT_ROUNDS.
+    """
+    try:
+        with open(config_path, 'r') as f:
+            return int(json.load(f)["rounds"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return DEFAULT_ROUNDS
+
+
+def save_rounds(rounds: int, target_ms: float) -> None:
+    """
+    Store a calibrated cost factor in the configuration file.
+    """
+    with open(_config_path(), 'w') as f:
+        json.dump({"rounds": rounds, "target_ms": target_ms}, f)
+    _config_rounds.cache_clear()
+
+
+def calibrate_rounds(target_ms: float) -> int:
+    """
+    Find the highest cost factor hashing within target_ms on this host.
+
+    Each extra round doubles the hashing time, so rounds are raised from
+    the bcrypt minimum until the next one would exceed the target.
+
+    Returns:
+        int: The calibrated cost factor.
+    """
+    rounds = 4
+    while rounds < 31:
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms * 2 > target_ms:
+            break
+        rounds += 1
+    return rounds
+
+
+def hash_rounds(hashed_password: bytes) -> Optional[int]:
+    """
+    Cost factor a bcrypt hash was made with.
+
+    Returns:
+        int: The cost factor, or None if the hash can't be parsed.
+    """
+    try:
+        return int(hashed_password.split(b"$")[2])
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+
+
+def _hashpw(password: bytes, rounds: int = DEFAULT_ROUNDS) -> bytes:
+    """
+    Hash a password in a worker process.
+
+    Returns:
+        bytes: The salted hash of the password.
+    """
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password: bytes, hashed_password: bytes) -> bool:
+    """
+    Check a password against its hash in a worker process.
+
+    Returns:
+        bool: True if the password matches the hash.
+    """
+    return bcrypt.checkpw(password, hashed_password)
+
+
+class HashingExecutor:
+    """
+    Process pool for bcrypt work with a bounded number of pending jobs.
+
+    Submitting beyond `max_pending` queued or running jobs raises
+    HashingSaturated right away instead of piling up requests, except for
+    batch work submitted with wait=True.
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None) -> None:
+        """
+        Initialize the pool, sized to the number of cores by default.
+        """
+        workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._slots = BoundedSemaphore(max_pending or workers * 4)
+
+    def submit(self, fn, *args, wait: bool = False) -> Future:
+        """
+        Schedule a call in the pool, waiting for room when wait is set.
+
+        Raises:
+            HashingSaturated: If the pending jobs bound is reached.
+        """
+        if not self._slots.acquire(blocking=wait):
+            raise HashingSaturated("Hashing pool is saturated")
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_password(self, password: str) -> bytes:
+        """
+        Hash a password in the pool.
+
+        Returns:
+            bytes: The salted hash of the password.
+        """
+        return self.submit(_hashpw, password.encode('utf-8'),
+                           get_rounds()).result()
+
+    def hash_passwords(self, passwords: Iterable[str]) -> List[bytes]:
+        """
+        Hash many passwords in the pool, waiting for room instead of
+        raising HashingSaturated, e.g. for bulk registration.
+
+        Returns:
+            list: The salted hashes, in the order of the passwords.
+        """
+        rounds = get_rounds()
+        futures = [self.submit(_hashpw, password.encode('utf-8'), rounds,
+                               wait=True) for password in passwords]
+        return [future.result() for future in futures]
+
+    def check_password(self, password: str, hashed_password: bytes) -> bool:
+        """
+        Check a password against its hash in the pool.
+
+        Returns:
+            bool: True if the password matches the hash.
+        """
+        return self.submit(_checkpw, password.encode('utf-8'),
+                           hashed_password).result()
+
+    async def hash_password_async(self, password: str) -> bytes:
+        """
+        Awaitable version of hash_password.
+        """
+        return await asyncio.wrap_future(
+            self.submit(_hashpw, password.encode('utf-8'), get_rounds()))
+
+    async def check_password_async(self, password: str,
+                                   hashed_password: bytes) -> bool:
+        """
+        Awaitable version of check_password.
+        """
+        return await asyncio.wrap_future(
+            self.submit(_checkpw, password.encode('utf-8'), hashed_password))
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        self._pool.shutdown()
+
+
+def get_executor() -> Optional[HashingExecutor]:
+    """
+    Build the hashing executor when enabled with AUTH_HASH_POOL=1.
+
+    Returns:
+        HashingExecutor: The executor, or None to hash on the caller thread.
+    """
+    if os.getenv("AUTH_HASH_POOL") != "1":
+        return None
+    try:
+        workers = int(os.getenv("AUTH_HASH_WORKERS", 0)) or None
+        max_pending = int(os.getenv("AUTH_HASH_MAX_PENDING", 0)) or None
+    except ValueError:
+        workers, max_pending = None, None
+    return HashingExecutor(workers, max_pending)
+
+
+if __name__ == "__main__":
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    cost = calibrate_rounds(target)
+    save_rounds(cost, target)
+    print("bcrypt rounds: {} (target {}ms)".format(cost, target))
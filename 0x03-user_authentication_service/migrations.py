@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the authentication database.
+"""
+
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple
+from sqlalchemy import Column, Integer, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from user import Base, User
+
+schema_version = Table(
+    "schema_version", Base.metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def _add_user_indexes(connection: Connection) -> None:
+    """
+    Version 1: index users on email (unique) and reset_token.
+
+    Raises:
+        IntegrityError: If existing rows share an email.
+    """
+    for index in User.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _move_sessions(connection: Connection) -> None:
+    """
+    Version 2: move users.session_id values to the sessions table.
+
+    The legacy column is cleared but left in place, SQLite versions
+    before 3.35 being unable to drop it.
+    """
+    columns = [column["name"]
+               for column in inspect(connection).get_columns("users")]
+    if "session_id" not in columns:
+        return
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(text(
+        "INSERT INTO sessions (session_id, user_id, created_at, last_seen) "
+        "SELECT session_id, id, :now, :now FROM users "
+        "WHERE session_id IS NOT NULL"), {"now": now})
+    connection.execute(text("UPDATE users SET session_id = NULL"))
+
+
+# Ordered upgrade steps, each run once in the transaction of its version
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _add_user_indexes),
+    (2, _move_sessions),
+]
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Create missing tables and apply pending migrations.
+
+    A database created from scratch already has the latest schema and is
+    stamped with the latest version without running any step.
+
+    Returns:
+        int: The schema version of the database.
+    """
+    latest = MIGRATIONS[-1][0] if MIGRATIONS else 0
+    with engine.begin() as connection:
+        fresh = not inspect(connection).has_table(User.__tablename__)
+        Base.metadata.create_all(connection)
+        current = connection.execute(
+            select(func.max(schema_version.c.version))).scalar()
+        if current is None:
+            current = latest if fresh else 0
+            connection.execute(schema_version.insert(), {"version": current})
+
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            step(connection)
+            connection.execute(schema_version.update(), {"version": version})
+        current = version
+    return current
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Session cache module: session ID -> user snapshot lookups kept in front of
+the database.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from os import getenv
+from threading import Lock
+from typing import NamedTuple, Optional
+import time
+
+
+class SessionUser(NamedTuple):
+    """Lightweight snapshot of the user owning a session."""
+    id: int
+    email: str
+
+
+class SessionCacheBackend(ABC):
+    """
+    Interface of a session cache storage.
+
+    The in-process LRUSessionCache is the default; a backend shared by
+    several workers (e.g. Redis) implements the same four methods.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionUser]:
+        """Return the cached snapshot of a session, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, session_id: str, user: SessionUser, ttl: float) -> None:
+        """Cache the snapshot of a session for ttl seconds."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Drop the snapshot of a session."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_user(self, user_id: int) -> None:
+        """Drop the snapshots of every session of a user."""
+        raise NotImplementedError
+
+
+class LRUSessionCache(SessionCacheBackend):
+    """
+    Bounded in-process LRU cache whose entries expire after their TTL.
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        """Initialize the cache with a size bound."""
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = Lock()
+
+    def _drop(self, session_id: str) -> None:
+        """Remove an entry, the lock being held."""
+        user, _ = self._entries.pop(session_id)
+        sessions = self._by_user.get(user.id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._by_user[user.id]
+
+    def get(self, session_id: str) -> Optional[SessionUser]:
+        """Return the cached snapshot of a session, or None."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                self._drop(session_id)
+                return None
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def set(self, session_id: str, user: SessionUser, ttl: float) -> None:
+        """Cache the snapshot of a session for ttl seconds."""
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+            self._entries[session_id] = (user, time.monotonic() + ttl)
+            self._by_user.setdefault(user.id, set()).add(session_id)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, session_id: str) -> None:
+        """Drop the snapshot of a session."""
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+
+    def delete_user(self, user_id: int) -> None:
+        """Drop the snapshots of every session of a user."""
+        with self._lock:
+            for session_id in list(self._by_user.get(user_id, ())):
+                self._drop(session_id)
+
+
+class SessionCache:
+    """
+    Read-through cache front counting hits and misses.
+
+    Invalidations win over concurrent fills: a reader takes fill_token()
+    before reading the database and passes it to set(), which drops the
+    snapshot if any session was invalidated in between.
+    """
+
+    def __init__(self, backend: SessionCacheBackend, ttl: float) -> None:
+        """Initialize the cache over a backend with an entry TTL."""
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._invalidations = 0
+        self._lock = Lock()
+
+    def get(self, session_id: str) -> Optional[SessionUser]:
+        """Return the cached snapshot of a session, counting the lookup."""
+        user = self.backend.get(session_id)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def fill_token(self) -> int:
+        """Token to pass to set() for a snapshot about to be read."""
+        with self._lock:
+            return self._invalidations
+
+    def set(self, session_id: str, user: SessionUser,
+            ttl: Optional[float] = None,
+            token: Optional[int] = None) -> None:
+        """
+        Cache a snapshot for at most the cache TTL, unless a session was
+        invalidated since token was taken.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if token is None or token == self._invalidations:
+                self.backend.set(session_id, user, ttl)
+
+    def delete(self, session_id: str) -> None:
+        """Drop the snapshot of a session."""
+        with self._lock:
+            self._invalidations += 1
+            self.backend.delete(session_id)
+
+    def delete_user(self, user_id: int) -> None:
+        """Drop the snapshots of every session of a user."""
+        with self._lock:
+            self._invalidations += 1
+            self.backend.delete_user(user_id)
+
+    def stats(self) -> dict:
+        """Hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def get_session_cache(backend: Optional[SessionCacheBackend] = None
+                      ) -> Optional[SessionCache]:
+    """
+    Build the session cache from SESSION_CACHE_SIZE (default 10000, 0
+    disables it) and SESSION_CACHE_TTL (seconds, default 30).
+
+    Returns:
+        SessionCache: The cache, or None when disabled.
+    """
+    try:
+        size = int(getenv("SESSION_CACHE_SIZE", 10000))
+        ttl = float(getenv("SESSION_CACHE_TTL", 30))
+    except ValueError:
+        size, ttl = 10000, 30.0
+    if backend is None:
+        if size <= 0:
+            return None
+        backend = LRUSessionCache(size)
+    return SessionCache(backend, ttl)
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 """
 User model definition for SQLAlchemy.
-Defines the structure of the users table in the database.
+Defines the structure of the users and sessions tables in the database.
 """
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -17,7 +17,21 @@ class User(Base):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250), nullable=True)
-    reset_token = Column(String(250), nullable=True)
+    reset_token = Column(String(250), nullable=True, index=True)
+
+
+class UserSession(Base):
+    """
+    SQLAlchemy model for the 'sessions' table, one row per logged-in
+    device of a user.
+    """
+    __tablename__ = 'sessions'
+
+    session_id = Column(String(250), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'),
+                     nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+    last_seen = Column(DateTime, nullable=False)